@@ -1,6 +1,8 @@
 from datetime import datetime
 import json
 from abc import ABC, abstractmethod
+from operator import itemgetter
+from retention import Compacteur, PolitiqueRetention, taille_memoire
 
 class Horodatable:
     def horodatage(self):
@@ -13,11 +15,16 @@ class Validable:
         print("Validation OK")
 
 class Serializable:
+    # Etat interne de la retention et flux de changements, sans valeur stable a exporter.
+    _ATTRIBUTS_NON_SERIALISES = {
+        '_ATTRIBUTS_NON_SERIALISES', '_compacteur', '_compaction_automatique', 'flux_changements'
+    }
+    
     def to_json(self):
         """Serialise l'objet en JSON en incluant tous ses attributs non callable."""
         data = {}
         for attr_name in dir(self):
-            if not attr_name.startswith('__'):  
+            if not attr_name.startswith('__') and attr_name not in self._ATTRIBUTS_NON_SERIALISES:
                 attr_value = getattr(self, attr_name)
                 if not callable(attr_value):  
                     if isinstance(attr_value, datetime):
@@ -36,9 +43,28 @@ class Serializable:
         return json.dumps(data, indent=2, ensure_ascii=False)
 
 class Historisable:
+    flux_changements = None
+    
     def __init__(self):
         super().__init__()
         self._historique = []
+        self._compacteur = None
+        self._compaction_automatique = True
+    
+    def configurer_retention(self, politique, automatique=True):
+        self._compacteur = Compacteur(politique, itemgetter('timestamp')) if politique else None
+        self._compaction_automatique = automatique
+        if automatique:
+            self.compacter_historique()
+    
+    def compacter_historique(self):
+        """Supprime les entrees hors politique et retourne leur nombre."""
+        if self._compacteur is None:
+            return 0
+        retirees, _ = self._compacteur.compacter(self._historique)
+        if retirees and self.flux_changements is not None:
+            self.flux_changements.publier(self, 'compaction', {'source': 'historique', 'entrees': retirees})
+        return len(retirees)
     
     def ajouter_historique(self, action, details=""):
         entree = {
@@ -47,6 +73,10 @@ class Historisable:
             'timestamp': datetime.now()
         }
         self._historique.append(entree)
+        if self.flux_changements is not None:
+            self.flux_changements.publier(self, 'historique', {'action': action, 'details': details}, entree['timestamp'])
+        if self._compaction_automatique:
+            self.compacter_historique()
         print(f"[HISTORIQUE] {action} - {details}")
     
     def afficher_historique(self):
@@ -55,6 +85,14 @@ class Historisable:
         for i, entree in enumerate(self._historique, 1):
             ts = entree['timestamp'].strftime("%Y-%m-%d %H:%M:%S")
             print(f"{i}. [{ts}] {entree['action']} - {entree['details']}")
+    
+    def rapport_memoire(self):
+        return {
+            'entrees_historique': len(self._historique),
+            'octets_historique': taille_memoire(self._historique),
+            'entrees_journal': 0,
+            'octets_journal': 0
+        }
 
 class Loggable(ABC):
     
@@ -147,6 +185,14 @@ def main():
     print("\n Exemple 6: JSON du rapport ")
     rapport_json = rapport.to_json()
     print(rapport_json)
+    
+    print("\n Exemple 7: Politique de retention ")
+    for i in range(5):
+        rapport.version += 0.1
+        rapport.publier()
+    print(f"Avant compaction: {rapport.rapport_memoire()}")
+    rapport.configurer_retention(PolitiqueRetention(garder_derniers=2))
+    print(f"Apres compaction: {rapport.rapport_memoire()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,12 +1,24 @@
 import json
 import csv
+import copy
+import asyncio
+import contextlib
+import time
 from datetime import datetime
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from operator import itemgetter
+from typing import List, Dict, Any, Optional
 import xml.etree.ElementTree as ET
-from io import StringIO
+from io import StringIO, BytesIO
+import pickle
+import struct
+from retention import Compacteur, PolitiqueRetention, taille_memoire
+from flux_changements import FluxChangements
+from index_recherche import IndexRecherche
 
 class Serializable:
+    # Exportes sous forme structuree par to_json(include_history=True).
+    _ATTRIBUTS_STRUCTURES = {'historique', 'journal'}
     
     def to_json(self, include_history: bool = False) -> str:
         data = self._get_serializable_data()
@@ -14,9 +26,23 @@ class Serializable:
             data['_historique'] = [
                 {
                     'timestamp': ts.isoformat(),
-                    'etat': etat
+                    'action': action,
+                    'etat': {
+                        attr: self._valeur_serializable(value)
+                        for attr, value in etat.items()
+                        if attr not in self._ATTRIBUTS_STRUCTURES
+                    }
                 }
-                for ts, etat in self.historique
+                for ts, action, etat in self.historique
+            ]
+        if include_history and hasattr(self, 'journal'):
+            data['_journal'] = [
+                {
+                    'timestamp': ts.isoformat(),
+                    'niveau': niveau,
+                    'message': message
+                }
+                for ts, niveau, message in self.journal
             ]
         
         data['_class'] = self.__class__.__name__
@@ -27,32 +53,78 @@ class Serializable:
         for attr_name, attr_value in self.__dict__.items():
             if attr_name.startswith('_') and attr_name != '_class':
                 continue
-            if isinstance(attr_value, datetime):
-                data[attr_name] = attr_value.isoformat()
-            elif hasattr(attr_value, '_get_serializable_data'):
-                data[attr_name] = attr_value._get_serializable_data()
-            else:
-                try:
-                    json.dumps(attr_value)
-                    data[attr_name] = attr_value
-                except (TypeError, ValueError):
-                    data[attr_name] = str(attr_value)
+            if attr_name in self._ATTRIBUTS_STRUCTURES:
+                continue
+            data[attr_name] = self._valeur_serializable(attr_value)
         
         return data
     
+    @staticmethod
+    def _valeur_serializable(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if hasattr(value, '_get_serializable_data'):
+            return value._get_serializable_data()
+        try:
+            json.dumps(value)
+            return value
+        except (TypeError, ValueError):
+            return str(value)
+    
     @classmethod
     def from_json(cls, json_str: str):
         data = json.loads(json_str)
         return cls(**data)
 
 class Historisable:
+    # Le journal n'est pas copie dans les etats: restaurer_etat ne le rembobine pas.
+    _ATTRIBUTS_NON_HISTORISES = {
+        'historique', 'journal', '_compacteur_historique', '_compaction_automatique',
+        '_compacteur_journal', '_compaction_journal_automatique', 'flux_changements'
+    }
+    flux_changements = None
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Un flux affecte a l'instance (abonnes, callbacks) ne se pickle pas.
+        etat = self.__dict__.copy()
+        etat.pop('flux_changements', None)
+        return etat
+    
+    def __setstate__(self, etat: Dict[str, Any]):
+        self.__dict__.update(etat)
     
     def __init__(self):
         self.historique: List[tuple] = []
+        self._compacteur_historique: Optional[Compacteur] = None
+        self._compaction_automatique = True
+    
+    def configurer_retention(self, politique: Optional[PolitiqueRetention], automatique: bool = True):
+        """Applique la politique a chaque enregistrement si automatique,
+        sinon uniquement lors des appels a compacter_historique()."""
+        self._compacteur_historique = Compacteur(politique, itemgetter(0)) if politique else None
+        self._compaction_automatique = automatique
+        if automatique:
+            self.compacter_historique()
+    
+    def compacter_historique(self) -> int:
+        """Retourne le nombre d'etats supprimes. Les index de restaurer_etat
+        portent ensuite sur les etats conserves."""
+        if self._compacteur_historique is None:
+            return 0
+        retires, _ = self._compacteur_historique.compacter(self.historique)
+        if retires and self.flux_changements is not None:
+            self.flux_changements.publier(self, 'compaction', {'source': 'historique', 'entrees': retires})
+        return len(retires)
     
     def enregistrer_etat(self, action: str = "Modification"):
         etat_copie = self._copier_etat()
-        self.historique.append((datetime.now(), action, etat_copie))
+        timestamp = datetime.now()
+        self.historique.append((timestamp, action, etat_copie))
+        if self.flux_changements is not None:
+            # Copie: un abonne ne doit pas pouvoir modifier l'historique.
+            self.flux_changements.publier(self, 'etat', {'action': action, 'etat': copy.deepcopy(etat_copie)}, timestamp)
+        if self._compaction_automatique:
+            self.compacter_historique()
         
         if hasattr(self, 'journaliser'):
             self.journaliser(f"Etat enregistre pour {action}")
@@ -60,15 +132,15 @@ class Historisable:
     def _copier_etat(self) -> Dict[str, Any]:
         etat = {}
         for attr, value in self.__dict__.items():
-            if attr != 'historique':  
+            if attr not in self._ATTRIBUTS_NON_HISTORISES:
                 if isinstance(value, (list, dict)):
-                    import copy
                     etat[attr] = copy.deepcopy(value)
                 else:
                     etat[attr] = value
         return etat
     
     def restaurer_etat(self, index: int = -1):
+        """Restaure les attributs de l'etat choisi; le journal est conserve tel quel."""
         if not self.historique:
             raise ValueError("Aucun etat historique disponible")
         
@@ -94,6 +166,15 @@ class Historisable:
                 if changements:
                     print("   Changements:", ", ".join(changements))
     
+    def rapport_memoire(self) -> Dict[str, int]:
+        journal = getattr(self, 'journal', [])
+        return {
+            'entrees_historique': len(self.historique),
+            'octets_historique': taille_memoire(self.historique),
+            'entrees_journal': len(journal),
+            'octets_journal': taille_memoire(journal)
+        }
+    
     def _detecter_changements(self, etat_precedent: Dict, etat_actuel: Dict) -> List[str]:
         changements = []
         for attr in set(etat_precedent.keys()) | set(etat_actuel.keys()):
@@ -102,9 +183,29 @@ class Historisable:
         return changements
 
 class Journalisable:
+    flux_changements = None
+    __getstate__ = Historisable.__getstate__
+    __setstate__ = Historisable.__setstate__
+    
     def __init__(self, niveau_log: str = "INFO"):
         self.niveau_log = niveau_log
         self.journal: List[tuple] = []
+        self._compacteur_journal: Optional[Compacteur] = None
+        self._compaction_journal_automatique = True
+    
+    def configurer_retention_journal(self, politique: Optional[PolitiqueRetention], automatique: bool = True):
+        self._compacteur_journal = Compacteur(politique, itemgetter(0)) if politique else None
+        self._compaction_journal_automatique = automatique
+        if automatique:
+            self.compacter_journal()
+    
+    def compacter_journal(self) -> int:
+        if self._compacteur_journal is None:
+            return 0
+        retirees, _ = self._compacteur_journal.compacter(self.journal)
+        if retirees and self.flux_changements is not None:
+            self.flux_changements.publier(self, 'compaction', {'source': 'journal', 'entrees': retirees})
+        return len(retirees)
     
     def journaliser(self, message: str, niveau: str = None):
         if niveau is None:
@@ -113,6 +214,10 @@ class Journalisable:
         timestamp = datetime.now()
         entree = (timestamp, niveau, message)
         self.journal.append(entree)
+        if self.flux_changements is not None:
+            self.flux_changements.publier(self, 'journal', {'niveau': niveau, 'message': message}, timestamp)
+        if self._compaction_journal_automatique:
+            self.compacter_journal()
         print(f"[{niveau}] {timestamp.strftime('%Y-%m-%d %H:%M:%S')}: {message}")
     
     def exporter_journal(self, format: str = "text") -> str:
@@ -312,6 +417,89 @@ class Commande(Serializable, Historisable, Journalisable, ExportableCSV, Exporta
         self.statut = "Expédiée"
         self.enregistrer_etat("Expédition")
         self.journaliser(f"Commande {self.id} expédiée")
+_CLASSES_CHECKPOINT = {classe.__name__: classe for classe in (Contrat, Tache, Commande)}
+# Un checkpoint ecrit par "python Exercice2.py" reference __main__.Contrat.
+_MODULES_CHECKPOINT = {'__main__', 'Exercice2'}
+
+CHECKPOINT_MAGIC = b"TP7C"
+CHECKPOINT_VERSION = 2
+_ENTETE_CHECKPOINT = struct.Struct("<4sHQ")
+
+class _UnpicklerCheckpoint(pickle.Unpickler):
+    def find_class(self, module, name):
+        if module in _MODULES_CHECKPOINT:
+            if name not in _CLASSES_CHECKPOINT:
+                raise pickle.UnpicklingError(f"Classe inconnue dans le checkpoint: {module}.{name}")
+            return _CLASSES_CHECKPOINT[name]
+        return super().find_class(module, name)
+
+def dump_checkpoint(entites: List[Any]) -> bytes:
+    """Sauvegarde binaire des entites avec leur historique et leur journal.
+
+    Format: entete (magic, version, taille) puis la liste complete picklee
+    (protocole 5) en une seule fois, ce qui conserve les references partagees
+    entre entites.
+    """
+    contenu = pickle.dumps(list(entites), protocol=5)
+    return _ENTETE_CHECKPOINT.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, len(contenu)) + contenu
+
+def load_checkpoint(donnees: bytes) -> List[Any]:
+    """Recharge les entites d'un checkpoint produit par dump_checkpoint, quel
+    que soit le module (__main__ ou Exercice2) qui l'a ecrit.
+
+    Utilise pickle: ne charger que des checkpoints de confiance.
+    """
+    vue = memoryview(donnees)
+    if len(vue) < _ENTETE_CHECKPOINT.size:
+        raise ValueError("Checkpoint tronque")
+    magic, version, taille = _ENTETE_CHECKPOINT.unpack_from(vue, 0)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError("Format de checkpoint invalide")
+    if version != CHECKPOINT_VERSION:
+        raise ValueError(f"Version de checkpoint non supportée: {version}")
+    if len(vue) - _ENTETE_CHECKPOINT.size != taille:
+        raise ValueError("Checkpoint tronque")
+    return _UnpicklerCheckpoint(BytesIO(vue[_ENTETE_CHECKPOINT.size:])).load()
+
+def benchmark_checkpoint(nombre: int = 200) -> List[Any]:
+    """Compare dump/load du checkpoint a to_json(include_history=True) sur
+    nombre contrats modifies; retourne les contrats crees."""
+    with contextlib.redirect_stdout(StringIO()):
+        contrats = []
+        for i in range(nombre):
+            c = Contrat(i, f"Contrat {i}", f"Client {i}", 1000.0 + i)
+            for j in range(5):
+                c.modifier(nouveau_montant=1000.0 + i + j)
+            contrats.append(c)
+    
+    debut = time.perf_counter()
+    json_total = [c.to_json(include_history=True) for c in contrats]
+    duree_json = time.perf_counter() - debut
+    
+    debut = time.perf_counter()
+    for j in json_total:
+        json.loads(j)
+    duree_json_load = time.perf_counter() - debut
+    
+    debut = time.perf_counter()
+    checkpoint = dump_checkpoint(contrats)
+    duree_dump = time.perf_counter() - debut
+    
+    debut = time.perf_counter()
+    recharges = load_checkpoint(checkpoint)
+    duree_load = time.perf_counter() - debut
+    
+    taille_json = sum(len(j.encode("utf-8")) for j in json_total)
+    print(f"JSON: dump {duree_json * 1000:.1f} ms, load {duree_json_load * 1000:.1f} ms, {taille_json} octets")
+    print(f"Checkpoint: dump {duree_dump * 1000:.1f} ms, load {duree_load * 1000:.1f} ms, "
+          f"{len(checkpoint)} octets")
+    print(f"Accélération dump: x{duree_json / duree_dump:.1f}")
+    # Pas a armes egales: json.loads ne fait que parser, load_checkpoint reconstruit les entites.
+    print(f"Load vs json.loads (parsing seul, sans reconstruction): x{duree_json_load / duree_load:.1f}")
+    print(f"Historique recharge: {len(recharges[0].historique)} etats, "
+          f"{len(recharges[0].journal)} entrees de journal")
+    return contrats
+
 def main():
     
     print("1. Creation et manipulation d'un Contrat")
@@ -362,5 +550,59 @@ def main():
     print("-" * 40)
     json_contrat = contrat.to_json(include_history=False)
     print(f"JSON original: {json_contrat[:100]}...")
+    
+    print("\n9. Checkpoint binaire vs JSON avec historique")
+    print("-" * 40)
+    contrats = benchmark_checkpoint()
+    
+    print("\n10. Politique de rétention")
+    print("-" * 40)
+    contrat_long = contrats[0]
+    print(f"Avant compaction: {contrat_long.rapport_memoire()}")
+    contrat_long.configurer_retention(PolitiqueRetention(garder_derniers=3, regroupement='jour'))
+    contrat_long.configurer_retention_journal(PolitiqueRetention(garder_derniers=10))
+    print(f"Après compaction: {contrat_long.rapport_memoire()}")
+    
+    print("\n11. Flux de changements")
+    print("-" * 40)
+    flux = FluxChangements()
+    for classe in (Contrat, Tache, Commande):
+        classe.flux_changements = flux
+    
+    abonnement = flux.abonner(
+        lambda lot: print(f"  -> lot de {len(lot)}: " + ", ".join(f"{e['classe']} {e['id']} {e['type']}" for e in lot)),
+        taille_lot=3
+    )
+    with contextlib.redirect_stdout(StringIO()):
+        tache2 = Tache(2, "Revue de code", "Alice")
+    tache2.reassigner("Charlie")
+    abonnement.livrer()
+    offset_sauvegarde = abonnement.offset
+    abonnement.desabonner()
+    
+    commande2 = Commande(1002, ["Ecran"], "Client ABC")
+    
+    async def consommer():
+        abonnement_async = flux.abonner_async(depuis_offset=offset_sauvegarde, taille_lot=10)
+        lot = await abonnement_async.recuperer_lot(delai=1.0)
+        print(f"Reprise depuis l'offset {offset_sauvegarde}: {len(lot)} evenements manqués")
+        abonnement_async.desabonner()
+    asyncio.run(consommer())
+    
+    print("\n12. Recherche plein texte dans les journaux et historiques")
+    print("-" * 40)
+    index = IndexRecherche()
+    for entite in contrats + [contrat, tache, tache2, commande, commande2]:
+        index.indexer_entite(entite)
+    abonnement_index = index.suivre(flux)
+    with contextlib.redirect_stdout(StringIO()):
+        tache.reassigner("Diane")
+    for entite, entree in index.rechercher("reassignation", type_entree='historique'):
+        print(f"{entite.__class__.__name__} {entite.id}: [{entree['timestamp'].strftime('%H:%M:%S')}] {entree['texte']}")
+    print(f"Journal 'Client ABC' (INFO): {len(index.rechercher('Client ABC', niveau='INFO'))} entrées")
+    abonnement_index.desabonner()
+    
+    for classe in (Contrat, Tache, Commande):
+        classe.flux_changements = None
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,5 +1,7 @@
 import datetime
 import copy
+from operator import itemgetter
+from retention import Compacteur, PolitiqueRetention, taille_memoire
 
 class ValidationMixin:
     def __init__(self):
@@ -15,10 +17,35 @@ class ValidationMixin:
             raise ValueError("Titre manquant ou invalide")
 
 class HistoriqueMixin:
+    flux_changements = None
+    
     def __init__(self):
         super().__init__()
         self._historique = []
         self._index_actuel = -1
+        self._compacteur_historique = None
+        self._compaction_automatique = True
+    
+    def configurer_retention(self, politique, automatique=True):
+        self._compacteur_historique = Compacteur(politique, itemgetter('timestamp')) if politique else None
+        self._compaction_automatique = automatique
+        if automatique:
+            self.compacter_historique()
+    
+    def compacter_historique(self):
+        """Supprime les versions hors politique. restaurer_version() indexe
+        ensuite les versions conservees; la version courante suit sa nouvelle
+        position, ou la plus proche version anterieure conservee. S'il n'y en
+        a aucune, _index_actuel vaut -1: la description courante ne correspond
+        plus a aucune version de l'historique."""
+        if self._compacteur_historique is None:
+            return 0
+        retirees, self._index_actuel = self._compacteur_historique.compacter(
+            self._historique, self._index_actuel
+        )
+        if retirees and self.flux_changements is not None:
+            self.flux_changements.publier(self, 'compaction', {'source': 'historique', 'entrees': retirees})
+        return len(retirees)
     
     def ajouter_historique(self, description, action="Modification"):
         timestamp = datetime.datetime.now()
@@ -29,6 +56,10 @@ class HistoriqueMixin:
         }
         self._historique.append(entree)
         self._index_actuel = len(self._historique) - 1
+        if self.flux_changements is not None:
+            self.flux_changements.publier(self, 'historique', {'action': action, 'description': copy.deepcopy(description)}, timestamp)
+        if self._compaction_automatique:
+            self.compacter_historique()
     
     def obtenir_derniere_description(self):
         if not self._historique:
@@ -54,12 +85,39 @@ class HistoriqueMixin:
             self._index_actuel = index
             return version
         raise IndexError("Index d'historique invalide")
+    
+    def rapport_memoire(self):
+        journal = getattr(self, '_journal', [])
+        return {
+            'entrees_historique': len(self._historique),
+            'octets_historique': taille_memoire(self._historique),
+            'entrees_journal': len(journal),
+            'octets_journal': taille_memoire(journal)
+        }
 
 class JournalisationMixin:
+    flux_changements = None
+    
     def __init__(self, niveau="INFO"):
         super().__init__()
         self._niveau_journal = niveau
         self._journal = []
+        self._compacteur_journal = None
+        self._compaction_journal_automatique = True
+    
+    def configurer_retention_journal(self, politique, automatique=True):
+        self._compacteur_journal = Compacteur(politique, itemgetter(0)) if politique else None
+        self._compaction_journal_automatique = automatique
+        if automatique:
+            self.compacter_journal()
+    
+    def compacter_journal(self):
+        if self._compacteur_journal is None:
+            return 0
+        retirees, _ = self._compacteur_journal.compacter(self._journal)
+        if retirees and self.flux_changements is not None:
+            self.flux_changements.publier(self, 'compaction', {'source': 'journal', 'entrees': retirees})
+        return len(retirees)
     
     def journaliser(self, message, niveau=None):
         if niveau is None:
@@ -68,6 +126,10 @@ class JournalisationMixin:
         timestamp = datetime.datetime.now()
         entree = (timestamp, niveau, message)
         self._journal.append(entree)
+        if self.flux_changements is not None:
+            self.flux_changements.publier(self, 'journal', {'niveau': niveau, 'message': message}, timestamp)
+        if self._compaction_journal_automatique:
+            self.compacter_journal()
         
         prefixe = f"[{niveau}]"
         if niveau == "ERREUR":
@@ -208,6 +270,12 @@ def main():
     print("\n--- Export du journal ---")
     journal_export = tache1.exporter_journal()
     print(f"Journal exporté avec {len(journal_export)} entrées")
+    
+    print("\n--- Politique de retention ---")
+    print(f"Avant compaction: {tache1.rapport_memoire()}")
+    tache1.configurer_retention(PolitiqueRetention(garder_derniers=2, regroupement='jour'))
+    tache1.configurer_retention_journal(PolitiqueRetention(garder_depuis=datetime.timedelta(hours=1)))
+    print(f"Apres compaction: {tache1.rapport_memoire()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,241 @@
+import asyncio
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional
+
+POLITIQUES = ('bloquer', 'supprimer_anciens', 'supprimer_nouveaux')
+
+class Abonnement:
+    """File bornee d'un abonne. offset est le prochain offset a consommer:
+    le conserver permet de reprendre via FluxChangements.abonner(depuis_offset=...).
+
+    Une file pleine ne bloque jamais le producteur: les politiques de
+    suppression comptent les pertes dans evenements_perdus."""
+
+    def __init__(self, flux, capacite: int = 1000, taille_lot: int = 1, politique: str = 'supprimer_anciens'):
+        if politique not in POLITIQUES:
+            raise ValueError(f"Politique non supportée: {politique}")
+        if capacite < 1 or taille_lot < 1:
+            raise ValueError("capacite et taille_lot doivent etre positifs")
+        self.flux = flux
+        self.capacite = capacite
+        self.taille_lot = taille_lot
+        self.politique = politique
+        self.offset = 0
+        self.evenements_perdus = 0
+        self.erreurs = 0
+        self.actif = True
+        self._fin_rattrapage = 0
+        self._file = deque()
+
+    def __len__(self):
+        return len(self._file) + max(0, self._fin_rattrapage - self.offset)
+
+    def _recevoir(self, evenement: Dict[str, Any]):
+        if len(self._file) >= self.capacite:
+            if self.politique == 'bloquer':
+                self._file_pleine()
+            elif self.politique == 'supprimer_nouveaux':
+                self.evenements_perdus += 1
+                return
+            else:
+                self._file.popleft()
+                self.evenements_perdus += 1
+        self._file.append(evenement)
+        self._notifier()
+
+    def _file_pleine(self):
+        pass
+
+    def _notifier(self):
+        pass
+
+    def _fermer(self):
+        pass
+
+    def _extraire_lot(self) -> List[Dict[str, Any]]:
+        # Les evenements rejoues sont lus directement dans le flux, sans passer par la file.
+        if self.offset < self._fin_rattrapage:
+            lot, perdus = self.flux._lire(self.offset, self._fin_rattrapage, self.taille_lot)
+            self.evenements_perdus += perdus
+            if lot:
+                self.offset = lot[-1]['offset'] + 1
+                return lot
+            self.offset = self._fin_rattrapage
+        lot = []
+        while self._file and len(lot) < self.taille_lot:
+            lot.append(self._file.popleft())
+        if lot:
+            self.offset = lot[-1]['offset'] + 1
+        return lot
+
+    def desabonner(self):
+        self.flux.desabonner(self)
+
+class AbonnementSynchrone(Abonnement):
+    """Avec un callback, les evenements sont livres par lots de taille_lot;
+    avec la politique 'bloquer', une file pleine est videe immediatement
+    dans le callback. Sans callback, les lots sont lus avec recuperer_lot()."""
+
+    def __init__(self, flux, callback: Optional[Callable[[List[Dict[str, Any]]], None]] = None, **options):
+        super().__init__(flux, **options)
+        if callback is None and self.politique == 'bloquer':
+            raise ValueError("La politique 'bloquer' requiert un callback")
+        self.callback = callback
+
+    def _file_pleine(self):
+        self.livrer()
+
+    def _notifier(self):
+        if self.callback is not None and len(self._file) >= self.taille_lot:
+            self.livrer()
+
+    def livrer(self):
+        """Livre au callback tous les evenements en attente, lots incomplets compris."""
+        while True:
+            lot = self._extraire_lot()
+            if not lot:
+                break
+            self.callback(lot)
+
+    def recuperer_lot(self) -> List[Dict[str, Any]]:
+        return self._extraire_lot()
+
+class AbonnementAsync(Abonnement):
+    """Abonne asyncio, lie a la boucle qui l'a cree: il est desabonne si
+    cette boucle est fermee. Les producteurs etant synchrones, seules les
+    politiques de suppression sont acceptees."""
+
+    def __init__(self, flux, **options):
+        super().__init__(flux, **options)
+        if self.politique == 'bloquer':
+            raise ValueError("La politique 'bloquer' n'est pas disponible en asyncio")
+        self._boucle = asyncio.get_running_loop()
+        self._disponible = asyncio.Event()
+
+    def _reveiller(self):
+        if self._boucle.is_closed():
+            self.desabonner()
+            return
+        try:
+            boucle_courante = asyncio.get_running_loop()
+        except RuntimeError:
+            boucle_courante = None
+        if boucle_courante is self._boucle:
+            self._disponible.set()
+        else:
+            self._boucle.call_soon_threadsafe(self._disponible.set)
+
+    def _notifier(self):
+        self._reveiller()
+
+    def _fermer(self):
+        self._reveiller()
+
+    async def recuperer_lot(self, delai: float = None) -> List[Dict[str, Any]]:
+        """Attend au moins un evenement et retourne jusqu'a taille_lot evenements.
+        Retourne une liste vide si delai expire ou si l'abonnement est clos."""
+        while not len(self):
+            if not self.actif:
+                return []
+            self._disponible.clear()
+            try:
+                await asyncio.wait_for(self._disponible.wait(), delai)
+            except asyncio.TimeoutError:
+                return []
+        return self._extraire_lot()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> List[Dict[str, Any]]:
+        lot = await self.recuperer_lot()
+        if not lot:
+            raise StopAsyncIteration
+        return lot
+
+class FluxChangements:
+    """Flux des changements publies par les mixins d'historique et de journal.
+    Les capacite derniers evenements sont conserves pour la reprise par offset.
+
+    Cout memoire: chaque evenement conservé garde une reference forte a son
+    entite et sa charge utile (copie complete de l'etat pour 'etat', entrees
+    retirees pour 'compaction'). Ces donnees survivent a la retention des
+    entites tant que l'evenement reste dans le journal du flux: choisir
+    capacite en fonction du retard de reprise acceptable."""
+
+    def __init__(self, capacite: int = 1000):
+        self._evenements = deque(maxlen=capacite)
+        self._prochain_offset = 0
+        self._abonnes: List[Abonnement] = []
+
+    @property
+    def prochain_offset(self) -> int:
+        return self._prochain_offset
+
+    def publier(self, entite, type_evenement: str, donnees: Dict[str, Any], timestamp: datetime = None) -> Dict[str, Any]:
+        """Les erreurs des abonnes sont comptees et signalees sans interrompre
+        le producteur ni les autres abonnes."""
+        evenement = {
+            'offset': self._prochain_offset,
+            'timestamp': timestamp or datetime.now(),
+            'type': type_evenement,
+            'classe': entite.__class__.__name__,
+            'id': getattr(entite, 'id', None),
+            'entite': entite,
+            'donnees': donnees
+        }
+        self._prochain_offset += 1
+        self._evenements.append(evenement)
+        for abonne in list(self._abonnes):
+            try:
+                abonne._recevoir(evenement)
+            except Exception as erreur:
+                abonne.erreurs += 1
+                print(f"[ERREUR] Abonne {abonne.__class__.__name__} (offset {evenement['offset']}): {erreur!r}")
+        return evenement
+
+    def _lire(self, offset: int, fin: int, nombre: int):
+        """Retourne (evenements de [offset, fin) limites a nombre, nombre d'evenements deja evinces)."""
+        premier = self._prochain_offset - len(self._evenements)
+        perdus = max(0, min(premier, fin) - offset)
+        debut = max(offset, premier) - premier
+        arret = min(fin - premier, debut + nombre)
+        return list(islice(self._evenements, debut, max(debut, arret))), perdus
+
+    def evenements_depuis(self, offset: int) -> List[Dict[str, Any]]:
+        premier = self._prochain_offset - len(self._evenements)
+        if offset < premier:
+            raise ValueError(f"Offset {offset} n'est plus disponible")
+        return list(islice(self._evenements, offset - premier, None))
+
+    def _ajouter_abonne(self, abonnement: Abonnement, depuis_offset: Optional[int]) -> Abonnement:
+        if depuis_offset is None:
+            abonnement.offset = self._prochain_offset
+        else:
+            if depuis_offset < self._prochain_offset - len(self._evenements):
+                raise ValueError(f"Offset {depuis_offset} n'est plus disponible")
+            abonnement.offset = depuis_offset
+        abonnement._fin_rattrapage = self._prochain_offset
+        self._abonnes.append(abonnement)
+        return abonnement
+
+    def abonner(self, callback=None, depuis_offset: int = None, **options) -> AbonnementSynchrone:
+        """Avec un callback, les evenements rejoues depuis depuis_offset sont
+        livres immediatement; sinon ils sont lus par recuperer_lot()."""
+        abonnement = self._ajouter_abonne(AbonnementSynchrone(self, callback, **options), depuis_offset)
+        if callback is not None:
+            abonnement.livrer()
+        return abonnement
+
+    def abonner_async(self, depuis_offset: int = None, **options) -> AbonnementAsync:
+        """Doit etre appele depuis une coroutine."""
+        return self._ajouter_abonne(AbonnementAsync(self, **options), depuis_offset)
+
+    def desabonner(self, abonnement: Abonnement):
+        if abonnement in self._abonnes:
+            self._abonnes.remove(abonnement)
+        if abonnement.actif:
+            abonnement.actif = False
+            abonnement._fermer()
@@ -0,0 +1,171 @@
+import re
+import unicodedata
+import weakref
+from datetime import datetime
+from typing import Any, Dict, List, Set, Tuple
+
+_MOT = re.compile(r"\w+")
+
+def normaliser_termes(texte: str) -> List[str]:
+    """Decoupe en mots minuscules sans accents: 'Réassignation' -> ['reassignation']."""
+    sans_accents = unicodedata.normalize('NFKD', texte)
+    sans_accents = ''.join(c for c in sans_accents if not unicodedata.combining(c))
+    return _MOT.findall(sans_accents.lower())
+
+def _texte_action(donnees: Dict[str, Any]) -> str:
+    return f"{donnees['action']} {donnees.get('details', donnees.get('description', ''))}".strip()
+
+def _lire_element(source: str, element) -> Tuple[datetime, str, str]:
+    """(timestamp, texte, niveau) d'une entree brute d'historique ou de journal."""
+    if source == 'journal':
+        timestamp, niveau, message = element
+        return timestamp, message, niveau
+    if isinstance(element, dict):
+        return element['timestamp'], _texte_action(element), None
+    timestamp, action, _ = element
+    return timestamp, action, None
+
+class IndexRecherche:
+    """Index inverse des messages de journal, des actions d'historique et des
+    descriptions de Tache, pour les entites des trois exercices.
+
+    Les entrees existantes sont ajoutees par indexer_entite(); les suivantes,
+    ainsi que les suppressions dues a la retention, arrivent au fil de l'eau
+    en branchant l'index sur un FluxChangements. L'index ne reference les
+    entites que faiblement: leurs entrees disparaissent quand elles sont
+    collectees. En mode suivre(), le flux garde cependant une reference
+    forte dans chaque evenement conserve: une entite reste vivante tant
+    qu'un de ses evenements figure parmi les capacite derniers du flux."""
+
+    def __init__(self):
+        self._entrees: Dict[int, Tuple[tuple, weakref.ref, Dict[str, Any]]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        # (id(entite), type, timestamp, niveau, texte) -> numeros: deux entrees reelles
+        # identiques (meme message, meme instant) donnent deux numeros sous la meme cle.
+        self._cles: Dict[tuple, List[int]] = {}
+        self._par_entite: Dict[int, Tuple[weakref.ref, Set[int]]] = {}
+        self._prochain_numero = 0
+
+    def __len__(self):
+        return len(self._entrees)
+
+    def ajouter(self, entite, type_entree: str, timestamp: datetime, texte: str, niveau: str = None) -> Dict[str, Any]:
+        cle = (id(entite), type_entree, timestamp, niveau, texte)
+        if id(entite) not in self._par_entite:
+            reference = weakref.ref(entite, lambda _, id_entite=id(entite): self._oublier(id_entite))
+            self._par_entite[id(entite)] = (reference, set())
+        reference, numeros = self._par_entite[id(entite)]
+
+        entree = {
+            'type': type_entree,
+            'timestamp': timestamp,
+            'niveau': niveau,
+            'texte': texte
+        }
+        numero = self._prochain_numero
+        self._prochain_numero += 1
+        self._entrees[numero] = (cle, reference, entree)
+        self._cles.setdefault(cle, []).append(numero)
+        numeros.add(numero)
+        for terme in set(normaliser_termes(texte)):
+            self._postings.setdefault(terme, set()).add(numero)
+        return entree
+
+    def retirer(self, entite, type_entree: str, timestamp: datetime, texte: str, niveau: str = None) -> bool:
+        """Retire une seule occurrence de l'entree."""
+        numeros = self._cles.get((id(entite), type_entree, timestamp, niveau, texte))
+        if not numeros:
+            return False
+        self._retirer_numero(numeros[0])
+        return True
+
+    def _retirer_numero(self, numero: int):
+        cle, _, entree = self._entrees.pop(numero)
+        numeros = self._cles[cle]
+        numeros.remove(numero)
+        if not numeros:
+            del self._cles[cle]
+        if cle[0] in self._par_entite:
+            self._par_entite[cle[0]][1].discard(numero)
+        for terme in set(normaliser_termes(entree['texte'])):
+            postings = self._postings.get(terme)
+            if postings is not None:
+                postings.discard(numero)
+                if not postings:
+                    del self._postings[terme]
+
+    def retirer_entite(self, entite):
+        self._oublier(id(entite))
+
+    def _oublier(self, id_entite: int):
+        _, numeros = self._par_entite.pop(id_entite, (None, set()))
+        for numero in numeros:
+            self._retirer_numero(numero)
+
+    def indexer_entite(self, entite):
+        """Indexe les entrees actuelles de l'entite; les occurrences deja indexees sont
+        ignorees. Pour refleter une compaction faite hors flux: retirer_entite() puis
+        indexer_entite()."""
+        # Exercice2 expose historique/journal, Exercice1 et Exercice3 _historique/_journal.
+        historique = getattr(entite, 'historique', None)
+        if historique is None:
+            historique = getattr(entite, '_historique', [])
+        journal = getattr(entite, 'journal', None)
+        if journal is None:
+            journal = getattr(entite, '_journal', [])
+
+        occurrences: Dict[tuple, int] = {}
+        for source, elements in (('historique', historique), ('journal', journal)):
+            for element in elements:
+                timestamp, texte, niveau = _lire_element(source, element)
+                cle = (source, timestamp, niveau, texte)
+                occurrences[cle] = occurrences.get(cle, 0) + 1
+        for (source, timestamp, niveau, texte), nombre in occurrences.items():
+            deja_indexees = len(self._cles.get((id(entite), source, timestamp, niveau, texte), []))
+            for _ in range(nombre - deja_indexees):
+                self.ajouter(entite, source, timestamp, texte, niveau)
+
+    def indexer_evenements(self, lot: List[Dict[str, Any]]):
+        for evenement in lot:
+            entite, donnees = evenement['entite'], evenement['donnees']
+            if evenement['type'] == 'compaction':
+                for element in donnees['entrees']:
+                    timestamp, texte, niveau = _lire_element(donnees['source'], element)
+                    self.retirer(entite, donnees['source'], timestamp, texte, niveau)
+            elif evenement['type'] == 'journal':
+                self.ajouter(entite, 'journal', evenement['timestamp'], donnees['message'], donnees['niveau'])
+            else:
+                self.ajouter(entite, 'historique', evenement['timestamp'], _texte_action(donnees))
+
+    def suivre(self, flux, depuis_offset: int = None):
+        """Abonne l'index au flux; la politique 'bloquer' garantit qu'aucun evenement n'est perdu."""
+        return flux.abonner(self.indexer_evenements, depuis_offset=depuis_offset, politique='bloquer')
+
+    def rechercher(self, requete: str, niveau: str = None, debut: datetime = None, fin: datetime = None,
+                   type_entree: str = None) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Retourne les (entite, entree) contenant tous les termes de la requete,
+        filtres par niveau, type d'entree et intervalle [debut, fin]."""
+        termes = set(normaliser_termes(requete))
+        if not termes:
+            return []
+        postings = sorted((self._postings.get(terme, set()) for terme in termes), key=len)
+        numeros = set(postings[0])
+        for autres in postings[1:]:
+            numeros.intersection_update(autres)
+
+        resultats = []
+        for numero in sorted(numeros):
+            _, reference, entree = self._entrees[numero]
+            entite = reference()
+            if entite is None:
+                continue
+            if niveau is not None and entree['niveau'] != niveau:
+                continue
+            if type_entree is not None and entree['type'] != type_entree:
+                continue
+            if debut is not None and entree['timestamp'] < debut:
+                continue
+            if fin is not None and entree['timestamp'] > fin:
+                continue
+            resultats.append((entite, entree))
+        return resultats
@@ -0,0 +1,109 @@
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional, Tuple
+
+class PolitiqueRetention:
+    """Conserve les garder_derniers dernieres entrees et celles plus recentes
+    que garder_depuis; au-dela, garde la derniere entree de chaque heure/jour
+    si regroupement est defini, sinon les supprime."""
+
+    REGROUPEMENTS = {'heure': '%Y-%m-%d %H', 'jour': '%Y-%m-%d'}
+
+    def __init__(self, garder_derniers: Optional[int] = None,
+                 garder_depuis: Optional[timedelta] = None,
+                 regroupement: Optional[str] = None):
+        if garder_derniers is not None and garder_derniers < 0:
+            raise ValueError("garder_derniers doit etre positif")
+        if regroupement is not None and regroupement not in self.REGROUPEMENTS:
+            raise ValueError(f"Regroupement non supporté: {regroupement}")
+        self.garder_derniers = garder_derniers
+        self.garder_depuis = garder_depuis
+        self.regroupement = regroupement
+
+    @property
+    def conserve_tout(self) -> bool:
+        return self.garder_derniers is None and self.garder_depuis is None and self.regroupement is None
+
+class Compacteur:
+    """Applique une politique a une liste chronologique, en place.
+
+    La liste est vue comme [entrees regroupees | fenetre conservee]. Chaque
+    appel ne traite que les entrees sorties de la fenetre depuis l'appel
+    precedent, le cout d'un ajout est donc constant en moyenne."""
+
+    def __init__(self, politique: PolitiqueRetention, timestamp_de: Callable[[Any], datetime]):
+        self.politique = politique
+        self.timestamp_de = timestamp_de
+        self._frontiere = 0
+        self._derniere_cle = None
+
+    def _hors_fenetre(self, index: int, taille: int, timestamp: datetime, limite: Optional[datetime]) -> bool:
+        if self.politique.garder_derniers is not None and index >= taille - self.politique.garder_derniers:
+            return False
+        if limite is not None and timestamp >= limite:
+            return False
+        return True
+
+    def compacter(self, entrees: List[Any], index_suivi: int = -1) -> Tuple[List[Any], int]:
+        """Retourne (entrees supprimees, nouvelle position de index_suivi).
+
+        Si l'entree suivie est supprimee, la position retournee est celle de la
+        derniere entree conservee qui la precede, ou -1 s'il n'y en a pas."""
+        if self.politique.conserve_tout:
+            return [], index_suivi
+        if self._frontiere > len(entrees):
+            self._frontiere, self._derniere_cle = 0, None
+
+        limite = None
+        if self.politique.garder_depuis is not None:
+            limite = datetime.now() - self.politique.garder_depuis
+        taille = len(entrees)
+        debut = fin = self._frontiere
+        while fin < taille and self._hors_fenetre(fin, taille, self.timestamp_de(entrees[fin]), limite):
+            fin += 1
+        if fin == debut:
+            return [], index_suivi
+
+        retirees = []
+        position_suivie = index_suivi
+        ecriture = debut
+        format_groupe = self.politique.REGROUPEMENTS.get(self.politique.regroupement)
+        for i in range(debut, fin):
+            entree = entrees[i]
+            if format_groupe is None:
+                if i == index_suivi:
+                    position_suivie = ecriture - 1
+                retirees.append(entree)
+                continue
+            cle = self.timestamp_de(entree).strftime(format_groupe)
+            if ecriture > 0 and cle == self._derniere_cle:
+                if position_suivie == ecriture - 1:
+                    position_suivie = ecriture - 2
+                retirees.append(entrees[ecriture - 1])
+                entrees[ecriture - 1] = entree
+            else:
+                entrees[ecriture] = entree
+                ecriture += 1
+                self._derniere_cle = cle
+            if i == index_suivi:
+                position_suivie = ecriture - 1
+
+        del entrees[ecriture:fin]
+        self._frontiere = ecriture
+        if index_suivi >= fin:
+            position_suivie = index_suivi - len(retirees)
+        return retirees, position_suivie
+
+def taille_memoire(obj, deja_vus: set = None) -> int:
+    """Taille approximative en octets de obj et de son contenu."""
+    if deja_vus is None:
+        deja_vus = set()
+    if id(obj) in deja_vus:
+        return 0
+    deja_vus.add(id(obj))
+    taille = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        taille += sum(taille_memoire(k, deja_vus) + taille_memoire(v, deja_vus) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        taille += sum(taille_memoire(item, deja_vus) for item in obj)
+    return taille